@@ -1,16 +1,74 @@
-import json
+import functools
 import os
 import re
 from datetime import datetime
+from typing import Annotated
 
-from flask import Flask, jsonify, render_template, request
+import msgspec
+import orjson
+import zstandard
+from flask import Flask, abort, current_app, render_template, request
+from flask_compress import Compress
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
 
 from research_engine import ResearchService
 
+try:
+    # Under gevent, threading.get_ident is per greenlet; the original one identifies the OS thread.
+    from gevent.monkey import get_original
+
+    _os_thread_id = get_original("_thread", "get_ident")
+except ImportError:
+    from threading import get_ident as _os_thread_id
+
 
 db = SQLAlchemy()
+compress = Compress()
 EMAIL_REGEX = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+ZSTD_LEVEL = 3
+HISTORY_PAGE_SIZE = 50
+
+# Store SQLite timestamps in the same text format as CURRENT_TIMESTAMP so that bound
+# datetimes compare correctly against server-filled values.
+TIMESTAMP = db.DateTime().with_variant(
+    sqlite.DATETIME(storage_format="%(year)04d-%(month)02d-%(day)02d %(hour)02d:%(minute)02d:%(second)02d"),
+    "sqlite",
+)
+
+
+class UtcNow(FunctionElement):
+    """Server-side current time in UTC, matching the naive UTC datetimes the app has always stored."""
+
+    type = db.DateTime()
+    inherit_cache = True
+
+
+@compiles(UtcNow)
+def _compile_utc_now(element, compiler, **kw):
+    # SQLite's CURRENT_TIMESTAMP is already UTC. Other backends without a variant below must run in UTC.
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(UtcNow, "postgresql")
+def _compile_utc_now_postgresql(element, compiler, **kw):
+    # CURRENT_TIMESTAMP is a timestamptz; converting it to UTC ignores the session TimeZone.
+    return "TIMEZONE('utc', CURRENT_TIMESTAMP)"
+
+
+# Dialects that support INSERT ... ON CONFLICT DO UPDATE ... RETURNING.
+_UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+
+# zstandard contexts are reusable but not thread-safe, so each OS thread keeps its own. Greenlets on
+# the same thread can share them: a compress/decompress call runs in C and never yields.
+_zstd_compressors: dict[int, zstandard.ZstdCompressor] = {}
+_zstd_decompressors: dict[int, zstandard.ZstdDecompressor] = {}
 
 
 class Student(db.Model):
@@ -20,9 +78,11 @@ class Student(db.Model):
     name = db.Column(db.String(120), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     institution = db.Column(db.String(200), nullable=True)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    created_at = db.Column(TIMESTAMP, server_default=UtcNow(), nullable=False)
 
-    research_logs = db.relationship("ResearchLog", backref="student", lazy=True, cascade="all, delete-orphan")
+    research_logs = db.relationship(
+        "ResearchLog", back_populates="student", lazy="raise", cascade="all, delete-orphan"
+    )
 
 
 class ResearchLog(db.Model):
@@ -32,25 +92,131 @@ class ResearchLog(db.Model):
     student_id = db.Column(db.Integer, db.ForeignKey("students.id"), nullable=False)
     topic = db.Column(db.String(300), nullable=False)
     query = db.Column(db.Text, nullable=False)
-    report_json = db.Column(db.Text, nullable=False)
-    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    report_blob = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(TIMESTAMP, server_default=UtcNow(), nullable=False)
+
+    student = db.relationship("Student", back_populates="research_logs", lazy="raise")
+
+    __table_args__ = (db.Index("ix_research_logs_student_created", student_id, created_at.desc(), id.desc()),)
+
+
+_SELECT_STUDENT_BY_EMAIL = db.select(Student).where(Student.email == db.bindparam("email"))
+
+_SELECT_HISTORY = (
+    db.select(ResearchLog.id, ResearchLog.topic, ResearchLog.query, ResearchLog.created_at)
+    .where(ResearchLog.student_id == db.bindparam("student_id"))
+    .order_by(ResearchLog.created_at.desc(), ResearchLog.id.desc())
+    .limit(HISTORY_PAGE_SIZE)
+)
+_SELECT_HISTORY_BEFORE = _SELECT_HISTORY.where(ResearchLog.created_at < db.bindparam("before_at", type_=TIMESTAMP))
+# created_at has one-second resolution on SQLite, so ties are broken by id.
+_SELECT_HISTORY_BEFORE_ID = _SELECT_HISTORY.where(
+    db.tuple_(ResearchLog.created_at, ResearchLog.id)
+    < db.tuple_(db.bindparam("before_at", type_=TIMESTAMP), db.bindparam("before_id", type_=db.Integer))
+)
+
+
+class ResearchRequest(msgspec.Struct):
+    student_name: str
+    student_email: str
+    topic: Annotated[str, msgspec.Meta(max_length=300)]
+    query: Annotated[str, msgspec.Meta(max_length=5000)]
+    institution: str = ""
+
+
+# Parses the JSON body and checks types/lengths in one pass.
+_RESEARCH_REQUEST_DECODER = msgspec.json.Decoder(ResearchRequest)
+
+
+def _compress_report(report_bytes: bytes) -> bytes:
+    thread_id = _os_thread_id()
+    compressor = _zstd_compressors.get(thread_id)
+    if compressor is None:
+        compressor = _zstd_compressors[thread_id] = zstandard.ZstdCompressor(level=ZSTD_LEVEL)
+    return compressor.compress(report_bytes)
+
+
+def _decompress_report(blob: bytes) -> dict:
+    thread_id = _os_thread_id()
+    decompressor = _zstd_decompressors.get(thread_id)
+    if decompressor is None:
+        decompressor = _zstd_decompressors[thread_id] = zstandard.ZstdDecompressor()
+    return orjson.loads(decompressor.decompress(blob))
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record) -> None:
+    # WAL lets history reads run alongside report inserts; synchronous=NORMAL drops the
+    # per-commit fsync, which is safe in WAL mode (only the latest commits can be lost on power failure).
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")
+    cursor.close()
+
+
+def _pool_size() -> int:
+    if os.getenv("DB_POOL_SIZE"):
+        return int(os.environ["DB_POOL_SIZE"])
+    # Each gunicorn worker process has its own pool, so split the database's connection budget between them.
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    return max(1, int(os.getenv("DB_MAX_CONNECTIONS", "80")) // workers)
+
+
+def _engine_options(uri: str) -> dict:
+    url = make_url(uri)
+    options = {"query_cache_size": 1200}
+    if url.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if url.database in (None, "", ":memory:"):
+            # In-memory databases use a single static connection; pool sizing does not apply.
+            return options
+    else:
+        # Server connections can be dropped while idle; file-backed SQLite connections cannot go stale.
+        options.update(pool_pre_ping=True, pool_recycle=3600)
+    options.update(pool_size=_pool_size(), max_overflow=0)
+    return options
+
+
+def _upsert_student(name: str, email: str, institution: str) -> int:
+    insert = _UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is None:
+        student = db.session.execute(_SELECT_STUDENT_BY_EMAIL, {"email": email}).scalar_one_or_none()
+        if not student:
+            student = Student(name=name, email=email, institution=institution)
+            db.session.add(student)
+            db.session.flush()
+        else:
+            student.name = name
+            student.institution = institution
+        return student.id
+
+    stmt = insert(Student).values(name=name, email=email, institution=institution)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Student.email],
+        set_={"name": stmt.excluded.name, "institution": stmt.excluded.institution},
+    ).returning(Student.id)
+    return db.session.execute(stmt).scalar_one()
+
+
+def _orjson_response(obj, status: int = 200):
+    return current_app.response_class(orjson.dumps(obj), status=status, mimetype="application/json")
 
 
-def _validate_research_payload(payload: dict) -> tuple[bool, str]:
+@functools.lru_cache(maxsize=2048)
+def _email_ok(email: str) -> bool:
+    return EMAIL_REGEX.match(email) is not None
+
+
+def _validate_research_payload(payload: ResearchRequest) -> tuple[bool, str]:
     required = ["student_name", "student_email", "topic", "query"]
     for key in required:
-        if not payload.get(key, "").strip():
+        if not getattr(payload, key).strip():
             return False, f"{key} is required"
 
-    if not EMAIL_REGEX.match(payload.get("student_email", "").strip().lower()):
+    if not _email_ok(payload.student_email.strip().lower()):
         return False, "student_email format is invalid"
 
-    if len(payload.get("topic", "")) > 300:
-        return False, "topic must be <= 300 characters"
-
-    if len(payload.get("query", "")) > 5000:
-        return False, "query must be <= 5000 characters"
-
     return True, ""
 
 
@@ -58,11 +224,21 @@ def create_app():
     app = Flask(__name__)
     app.config["SQLALCHEMY_DATABASE_URI"] = os.getenv("DATABASE_URL", "sqlite:///research_assistant.db")
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = _engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
+    app.config["COMPRESS_MIMETYPES"] = ["application/json"]
+    app.config["COMPRESS_LEVEL"] = 5
+    app.config["COMPRESS_MIN_SIZE"] = 512
 
     db.init_app(app)
+    compress.init_app(app)
 
     with app.app_context():
+        if db.engine.dialect.name == "sqlite":
+            event.listen(db.engine, "connect", _set_sqlite_pragmas)
         db.create_all()
+        # Open a pooled connection now so the first request does not pay for it.
+        with db.engine.connect() as conn:
+            conn.exec_driver_sql("SELECT 1")
 
     @app.get("/")
     def index():
@@ -70,91 +246,125 @@ def create_app():
 
     @app.get("/api/health")
     def health():
-        return jsonify({"status": "ok"})
+        return _orjson_response({"status": "ok"})
 
     @app.post("/api/research")
     def run_research():
-        payload = request.get_json(silent=True) or {}
+        try:
+            payload = _RESEARCH_REQUEST_DECODER.decode(request.get_data())
+        except msgspec.DecodeError as exc:
+            return _orjson_response({"error": str(exc)}, 400)
+
         is_valid, error = _validate_research_payload(payload)
         if not is_valid:
-            return jsonify({"error": error}), 400
+            return _orjson_response({"error": error}, 400)
 
-        student_name = payload.get("student_name", "").strip()
-        student_email = payload.get("student_email", "").strip().lower()
-        institution = payload.get("institution", "").strip()[:200]
-        topic = payload.get("topic", "").strip()
-        query = payload.get("query", "").strip()
-
-        student = Student.query.filter_by(email=student_email).first()
-        if not student:
-            student = Student(name=student_name, email=student_email, institution=institution)
-            db.session.add(student)
-            db.session.flush()
-        else:
-            student.name = student_name
-            student.institution = institution
+        student_name = payload.student_name.strip()
+        student_email = payload.student_email.strip().lower()
+        institution = payload.institution.strip()[:200]
+        topic = payload.topic.strip()
+        query = payload.query.strip()
 
+        # Generate and encode the report before touching the database: the OpenAI call can take up to
+        # 45 s and must not run inside the write transaction.
         report = ResearchService.generate_report(topic=topic, query=query)
+        # Serialize once: the same bytes are compressed for storage and spliced into the response.
+        report_bytes = orjson.dumps(report)
+        report_blob = _compress_report(report_bytes)
 
-        research_log = ResearchLog(student_id=student.id, topic=topic, query=query, report_json=json.dumps(report))
+        student_id = _upsert_student(student_name, student_email, institution)
+        research_log = ResearchLog(student_id=student_id, topic=topic, query=query, report_blob=report_blob)
         db.session.add(research_log)
+        db.session.flush()
+        # Read the id before commit expires the instance, which would cost a refresh SELECT.
+        research_id = research_log.id
         db.session.commit()
 
-        return jsonify(
+        envelope = orjson.dumps(
             {
                 "message": "Research report generated successfully.",
-                "research_id": research_log.id,
-                "student_id": student.id,
-                "report": report,
+                "research_id": research_id,
+                "student_id": student_id,
             }
         )
+        return current_app.response_class(
+            envelope[:-1] + b',"report":' + report_bytes + b"}", mimetype="application/json"
+        )
 
     @app.get("/api/history/<int:student_id>")
     def get_history(student_id: int):
-        student = Student.query.get_or_404(student_id)
-        logs = (
-            ResearchLog.query.filter_by(student_id=student_id)
-            .order_by(ResearchLog.created_at.desc())
-            .all()
-        )
-
-        return jsonify(
+        student = db.session.get(Student, student_id)
+        if student is None:
+            abort(404)
+
+        stmt, params = _SELECT_HISTORY, {"student_id": student_id}
+        before = request.args.get("before")
+        if before:
+            try:
+                params["before_at"] = datetime.fromisoformat(before)
+            except ValueError:
+                return _orjson_response({"error": "before must be an ISO 8601 timestamp"}, 400)
+            params["before_id"] = request.args.get("before_id", type=int)
+            stmt = _SELECT_HISTORY_BEFORE if params["before_id"] is None else _SELECT_HISTORY_BEFORE_ID
+
+        student_data = {
+            "id": student.id,
+            "name": student.name,
+            "email": student.email,
+            "institution": student.institution,
+        }
+        rows = db.session.execute(stmt, params).all()
+        # Return the pooled connection before the response is written to a possibly slow client.
+        db.session.close()
+
+        history = [
+            {
+                "research_id": row.id,
+                "topic": row.topic,
+                "query": row.query,
+                "created_at": row.created_at.isoformat(),
+            }
+            for row in rows
+        ]
+        last = history[-1] if len(history) == HISTORY_PAGE_SIZE else None
+        return _orjson_response(
             {
-                "student": {
-                    "id": student.id,
-                    "name": student.name,
-                    "email": student.email,
-                    "institution": student.institution,
-                },
-                "history": [
-                    {
-                        "research_id": log.id,
-                        "topic": log.topic,
-                        "query": log.query,
-                        "created_at": log.created_at.isoformat(),
-                    }
-                    for log in logs
-                ],
+                "student": student_data,
+                "history": history,
+                "next_before": last and last["created_at"],
+                "next_before_id": last and last["research_id"],
             }
         )
 
     @app.get("/api/history/detail/<int:research_id>")
     def get_history_detail(research_id: int):
-        log = ResearchLog.query.get_or_404(research_id)
-        return jsonify(
-            {
-                "research_id": log.id,
-                "student_id": log.student_id,
-                "topic": log.topic,
-                "query": log.query,
-                "created_at": log.created_at.isoformat(),
-                "report": json.loads(log.report_json),
-            }
-        )
+        log = db.session.get(ResearchLog, research_id)
+        if log is None:
+            abort(404)
+
+        # Research logs never change after creation, so the id alone identifies the report. The ETag is
+        # weak so Flask-Compress leaves it untouched and it matches whichever encoding the client got.
+        etag = f"research-{log.id}"
+        if request.if_none_match.contains_weak(etag):
+            response = current_app.response_class(status=304)
+        else:
+            response = _orjson_response(
+                {
+                    "research_id": log.id,
+                    "student_id": log.student_id,
+                    "topic": log.topic,
+                    "query": log.query,
+                    "created_at": log.created_at.isoformat(),
+                    "report": _decompress_report(log.report_blob),
+                }
+            )
+        response.set_etag(etag, weak=True)
+        response.headers["Cache-Control"] = "private, max-age=0, must-revalidate"
+        return response
 
     return app
 
 
 if __name__ == "__main__":
     app = create_app()
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(host="0.0.0.0", port=5000, debug=os.getenv("FLASK_DEBUG") == "1")
@@ -3,7 +3,7 @@ CREATE TABLE students (
   name VARCHAR(120) NOT NULL,
   email VARCHAR(120) NOT NULL UNIQUE,
   institution VARCHAR(200),
-  created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
 );
 
 CREATE TABLE research_logs (
@@ -11,7 +11,9 @@ CREATE TABLE research_logs (
   student_id INTEGER NOT NULL,
   topic VARCHAR(300) NOT NULL,
   query TEXT NOT NULL,
-  report_json TEXT NOT NULL,
-  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  report_blob BLOB NOT NULL,
+  created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
   FOREIGN KEY(student_id) REFERENCES students(id)
 );
+
+CREATE INDEX ix_research_logs_student_created ON research_logs (student_id, created_at DESC, id DESC);
@@ -0,0 +1,11 @@
+import os
+
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2 * (os.cpu_count() or 1) + 1))
+# Workers inherit this, so app.py can divide the database connection budget between them.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "gevent"
+worker_connections = 500
+timeout = 60
+keepalive = 5
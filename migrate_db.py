@@ -0,0 +1,65 @@
+"""One-shot migration for databases created before report_blob and server-side timestamps.
+
+Rebuilds students and research_logs from the current models: report_json (TEXT) becomes the
+zstd-compressed report_blob, created_at gets its CURRENT_TIMESTAMP default, and the history index
+is created. Rows are copied through memory, which is fine for a one-off upgrade. SQLite runs DDL
+outside the transaction, so back up the database file first.
+
+Usage: python migrate_db.py  (uses DATABASE_URL like the app)
+"""
+
+from sqlalchemy import inspect, text
+
+from app import TIMESTAMP, ResearchLog, Student, _compress_report, create_app, db
+
+
+def migrate() -> int:
+    app = create_app()
+    with app.app_context(), db.engine.begin() as conn:
+        columns = {column["name"] for column in inspect(conn).get_columns("research_logs")}
+        if "report_json" not in columns:
+            return 0
+
+        students = [
+            row._asdict()
+            for row in conn.execute(
+                text("SELECT id, name, email, institution, created_at FROM students").columns(created_at=TIMESTAMP)
+            )
+        ]
+        logs = [
+            {
+                "id": row.id,
+                "student_id": row.student_id,
+                "topic": row.topic,
+                "query": row.query,
+                "report_blob": _compress_report(row.report_json.encode("utf-8")),
+                "created_at": row.created_at,
+            }
+            for row in conn.execute(
+                text("SELECT id, student_id, topic, query, report_json, created_at FROM research_logs").columns(
+                    created_at=TIMESTAMP
+                )
+            )
+        ]
+
+        db.metadata.drop_all(conn)
+        db.metadata.create_all(conn)
+
+        if students:
+            conn.execute(Student.__table__.insert(), students)
+        if logs:
+            conn.execute(ResearchLog.__table__.insert(), logs)
+
+        if conn.dialect.name == "postgresql":
+            for table in ("students", "research_logs"):
+                conn.execute(
+                    text(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                        f"COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+                    )
+                )
+        return len(logs)
+
+
+if __name__ == "__main__":
+    print(f"Migrated {migrate()} research log(s).")
@@ -1,8 +1,45 @@
-import json
+import atexit
+import functools
 import os
-from textwrap import dedent
+import time
 from typing import Any, Dict, List
-from urllib import error, request
+
+import httpx
+import orjson
+
+
+OPENAI_CHAT_URL = "https://api.openai.com/v1/chat/completions"
+EXTERNAL_REPORT_TTL_SECONDS = int(os.getenv("EXTERNAL_REPORT_TTL_SECONDS", "3600"))
+
+# Shared client so TCP/TLS connections to the OpenAI API are kept alive between requests.
+_HTTP = httpx.Client(http2=True, timeout=45, headers={"Content-Type": "application/json"})
+atexit.register(_HTTP.close)
+
+_SYSTEM_PROMPT = """You are a scientific research assistant for students.
+Produce rigorous yet easy-to-understand outputs.
+Include evidence-oriented literature analysis, research gap detection,
+a feasible student-level methodology, simulated quantitative results,
+references, PPT outline, viva questions, and tools/datasets suggestions.
+Return valid JSON only."""
+
+_USER_PROMPT_TEMPLATE = """Student topic: {topic}
+Student research query: {query}
+
+Return JSON with these keys exactly:
+abstract, introduction, literature_review, research_gaps,
+methodology, simulated_results, conclusion, references,
+ppt_outline, viva_questions, datasets_and_tools.
+
+Requirements:
+- literature_review must include source + finding entries from: Google Scholar, IEEE Xplore, PubMed
+- methodology must include design + steps
+- simulated_results must include summary + table[] with metric, baseline, proposed
+- references must be a list of citation strings
+- datasets_and_tools must include datasets[] and tools[]"""
+
+
+class _NoExternalReport(Exception):
+    """Raised inside the external-report cache so failed OpenAI calls are not memoized."""
 
 
 class PromptEngine:
@@ -10,37 +47,11 @@ class PromptEngine:
 
     @staticmethod
     def build_system_prompt() -> str:
-        return dedent(
-            """
-            You are a scientific research assistant for students.
-            Produce rigorous yet easy-to-understand outputs.
-            Include evidence-oriented literature analysis, research gap detection,
-            a feasible student-level methodology, simulated quantitative results,
-            references, PPT outline, viva questions, and tools/datasets suggestions.
-            Return valid JSON only.
-            """
-        ).strip()
+        return _SYSTEM_PROMPT
 
     @staticmethod
     def build_user_prompt(topic: str, query: str) -> str:
-        return dedent(
-            f"""
-            Student topic: {topic}
-            Student research query: {query}
-
-            Return JSON with these keys exactly:
-            abstract, introduction, literature_review, research_gaps,
-            methodology, simulated_results, conclusion, references,
-            ppt_outline, viva_questions, datasets_and_tools.
-
-            Requirements:
-            - literature_review must include source + finding entries from: Google Scholar, IEEE Xplore, PubMed
-            - methodology must include design + steps
-            - simulated_results must include summary + table[] with metric, baseline, proposed
-            - references must be a list of citation strings
-            - datasets_and_tools must include datasets[] and tools[]
-            """
-        ).strip()
+        return _USER_PROMPT_TEMPLATE.format(topic=topic, query=query)
 
 
 class ResearchService:
@@ -151,6 +162,12 @@ class ResearchService:
             },
         }
 
+    @staticmethod
+    @functools.lru_cache(maxsize=512)
+    def _fallback_report_bytes(topic: str, query: str) -> bytes:
+        # Cached serialized so every caller gets a fresh, mutable copy from orjson.loads.
+        return orjson.dumps(ResearchService._fallback_report(topic, query))
+
     @classmethod
     def _try_openai_json(cls, topic: str, query: str) -> Dict[str, Any] | None:
         api_key = os.getenv("OPENAI_API_KEY", "").strip()
@@ -168,35 +185,42 @@ class ResearchService:
             "response_format": {"type": "json_object"},
         }
 
-        req = request.Request(
-            "https://api.openai.com/v1/chat/completions",
-            data=json.dumps(payload).encode("utf-8"),
-            headers={
-                "Authorization": f"Bearer {api_key}",
-                "Content-Type": "application/json",
-            },
-            method="POST",
-        )
-
         try:
-            with request.urlopen(req, timeout=45) as response:
-                raw = json.loads(response.read().decode("utf-8"))
+            response = _HTTP.post(
+                OPENAI_CHAT_URL,
+                content=orjson.dumps(payload),
+                headers={"Authorization": f"Bearer {api_key}"},
+            )
+            response.raise_for_status()
+            raw = orjson.loads(response.content)
             content = raw["choices"][0]["message"]["content"]
-            parsed = json.loads(content)
+            parsed = orjson.loads(content)
             if cls.REQUIRED_KEYS.issubset(set(parsed.keys())):
                 return parsed
-        except (error.URLError, error.HTTPError, KeyError, json.JSONDecodeError, TimeoutError):
+        except (httpx.HTTPError, KeyError, orjson.JSONDecodeError):
             return None
 
         return None
 
+    @staticmethod
+    @functools.lru_cache(maxsize=256)
+    def _external_report_bytes(topic: str, query: str, ttl_bucket: int) -> bytes:
+        # ttl_bucket only varies the cache key, so entries expire every EXTERNAL_REPORT_TTL_SECONDS.
+        external = ResearchService._try_openai_json(topic, query)
+        if not external:
+            raise _NoExternalReport
+        return orjson.dumps(external)
+
     @classmethod
     def generate_report(cls, topic: str, query: str) -> Dict[str, Any]:
-        external = cls._try_openai_json(topic, query)
-        if external:
-            return external
-
-        report = cls._fallback_report(topic, query)
+        if os.getenv("OPENAI_API_KEY", "").strip():
+            ttl_bucket = int(time.time() // EXTERNAL_REPORT_TTL_SECONDS)
+            try:
+                return orjson.loads(cls._external_report_bytes(topic, query, ttl_bucket))
+            except _NoExternalReport:
+                pass
+
+        report = orjson.loads(cls._fallback_report_bytes(topic, query))
         report["prompt_debug"] = {
             "system_prompt": PromptEngine.build_system_prompt(),
             "user_prompt": PromptEngine.build_user_prompt(topic, query),
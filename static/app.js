@@ -138,6 +138,59 @@ researchForm.addEventListener("submit", async (event) => {
   }
 });
 
+function appendHistoryItem(item) {
+  const li = el("li");
+  li.appendChild(el("strong", item.topic));
+  li.appendChild(el("p", item.query));
+  li.appendChild(el("small", item.created_at));
+
+  const btn = el("button", "Open Report");
+  btn.className = "small-button";
+  btn.addEventListener("click", async () => {
+    btn.disabled = true;
+    btn.textContent = "Loading...";
+    try {
+      await loadResearchDetail(item.research_id);
+    } catch (error) {
+      alert(error.message);
+    } finally {
+      btn.disabled = false;
+      btn.textContent = "Open Report";
+    }
+  });
+
+  li.appendChild(btn);
+  historyList.appendChild(li);
+}
+
+function renderHistoryPage(studentId, data) {
+  data.history.forEach(appendHistoryItem);
+  if (!data.next_before) return;
+
+  const li = el("li");
+  const btn = el("button", "Load More");
+  btn.className = "small-button";
+  btn.addEventListener("click", async () => {
+    btn.disabled = true;
+    btn.textContent = "Loading...";
+    try {
+      const cursor = new URLSearchParams({ before: data.next_before, before_id: data.next_before_id });
+      const response = await fetch(`/api/history/${studentId}?${cursor}`);
+      const next = await response.json();
+      if (!response.ok) throw new Error(next.error || "Unable to load more history");
+      li.remove();
+      renderHistoryPage(studentId, next);
+    } catch (error) {
+      alert(error.message);
+      btn.disabled = false;
+      btn.textContent = "Load More";
+    }
+  });
+
+  li.appendChild(btn);
+  historyList.appendChild(li);
+}
+
 historyForm.addEventListener("submit", async (event) => {
   event.preventDefault();
   const studentId = document.getElementById("history-student-id").value;
@@ -160,30 +213,7 @@ historyForm.addEventListener("submit", async (event) => {
       return;
     }
 
-    data.history.forEach((item) => {
-      const li = el("li");
-      li.appendChild(el("strong", item.topic));
-      li.appendChild(el("p", item.query));
-      li.appendChild(el("small", item.created_at));
-
-      const btn = el("button", "Open Report");
-      btn.className = "small-button";
-      btn.addEventListener("click", async () => {
-        btn.disabled = true;
-        btn.textContent = "Loading...";
-        try {
-          await loadResearchDetail(item.research_id);
-        } catch (error) {
-          alert(error.message);
-        } finally {
-          btn.disabled = false;
-          btn.textContent = "Open Report";
-        }
-      });
-
-      li.appendChild(btn);
-      historyList.appendChild(li);
-    });
+    renderHistoryPage(studentId, data);
   } catch (error) {
     historyList.innerHTML = `<li>Network error: ${error.message}</li>`;
   }
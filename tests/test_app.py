@@ -0,0 +1,298 @@
+import gzip
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from datetime import datetime
+from unittest import mock
+
+import gevent
+import orjson
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.schema import CreateTable
+import zstandard
+
+import migrate_db
+import app as app_module
+from app import HISTORY_PAGE_SIZE, ResearchLog, Student, _engine_options, create_app, db
+from research_engine import ResearchService
+
+
+def research_payload(**overrides):
+    payload = {
+        "student_name": "Ada Lovelace",
+        "student_email": "ada@example.com",
+        "institution": "Analytical College",
+        "topic": "Edge AI",
+        "query": "How to optimize edge inference?",
+    }
+    payload.update(overrides)
+    return payload
+
+
+class AppTestCase(unittest.TestCase):
+    def setUp(self):
+        os.environ.pop("OPENAI_API_KEY", None)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmpdir.name, "test.db")
+        self.env = mock.patch.dict(os.environ, {"DATABASE_URL": f"sqlite:///{self.db_path}"})
+        self.env.start()
+        self.app = create_app()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        with self.app.app_context():
+            db.engine.dispose()
+        self.env.stop()
+        self.tmpdir.cleanup()
+
+
+class RunResearchTests(AppTestCase):
+    def test_upsert_creates_then_updates_student(self):
+        first = self.client.post("/api/research", json=research_payload())
+        self.assertEqual(first.status_code, 200)
+
+        second = self.client.post(
+            "/api/research",
+            json=research_payload(
+                student_name="Ada King", student_email=" ADA@example.com ", institution="Royal Society"
+            ),
+        )
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(first.get_json()["student_id"], second.get_json()["student_id"])
+
+        with self.app.app_context():
+            students = db.session.execute(db.select(Student)).scalars().all()
+            self.assertEqual(len(students), 1)
+            self.assertEqual(students[0].name, "Ada King")
+            self.assertEqual(students[0].institution, "Royal Society")
+
+    def test_report_is_generated_outside_a_database_transaction(self):
+        generate_report = ResearchService.generate_report
+
+        def check_no_transaction(topic, query):
+            self.assertFalse(db.session().in_transaction())
+            return generate_report(topic, query)
+
+        with mock.patch.object(ResearchService, "generate_report", side_effect=check_no_transaction):
+            response = self.client.post("/api/research", json=research_payload())
+        self.assertEqual(response.status_code, 200)
+
+    def test_invalid_payloads_are_rejected(self):
+        cases = [
+            (b"not json", "malformed"),
+            (orjson.dumps({"student_name": "Ada"}), "missing required field"),
+            (orjson.dumps(research_payload(query=None)), "Expected `str`"),
+            (orjson.dumps(research_payload(topic="x" * 301)), "length <= 300"),
+            (orjson.dumps(research_payload(student_name="   ")), "student_name is required"),
+            (orjson.dumps(research_payload(student_email="not-an-email")), "student_email format is invalid"),
+        ]
+        for body, message in cases:
+            with self.subTest(message=message):
+                response = self.client.post("/api/research", data=body, content_type="application/json")
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(message, response.get_json()["error"])
+
+
+class HistoryDetailTests(AppTestCase):
+    def test_report_round_trips_through_compressed_storage(self):
+        created = self.client.post("/api/research", json=research_payload()).get_json()
+        research_id = created["research_id"]
+
+        with self.app.app_context():
+            blob = db.session.get(ResearchLog, research_id).report_blob
+        self.assertEqual(orjson.loads(zstandard.ZstdDecompressor().decompress(blob)), created["report"])
+
+        detail = self.client.get(f"/api/history/detail/{research_id}")
+        self.assertEqual(detail.status_code, 200)
+        self.assertEqual(detail.get_json()["report"], created["report"])
+        self.assertEqual(detail.get_json()["student_id"], created["student_id"])
+
+    def test_if_none_match_returns_not_modified(self):
+        research_id = self.client.post("/api/research", json=research_payload()).get_json()["research_id"]
+        first = self.client.get(f"/api/history/detail/{research_id}")
+        etag = first.headers["ETag"]
+
+        cached = self.client.get(f"/api/history/detail/{research_id}", headers={"If-None-Match": etag})
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(cached.data, b"")
+        self.assertEqual(cached.headers["ETag"], etag)
+
+        other = self.client.get(f"/api/history/detail/{research_id}", headers={"If-None-Match": 'W/"research-0"'})
+        self.assertEqual(other.status_code, 200)
+
+    def test_missing_research_log_returns_404(self):
+        self.assertEqual(self.client.get("/api/history/detail/999").status_code, 404)
+
+
+class HistoryTests(AppTestCase):
+    def test_history_pages_through_rows_created_in_the_same_second(self):
+        same_second = datetime(2024, 5, 1, 12, 0, 0)
+        with self.app.app_context():
+            student = Student(name="Ada", email="ada@example.com", institution="")
+            db.session.add(student)
+            db.session.flush()
+            student_id = student.id
+            db.session.add(
+                ResearchLog(
+                    student_id=student_id,
+                    topic="older",
+                    query="q",
+                    report_blob=b"",
+                    created_at=datetime(2024, 5, 1, 11, 59, 59),
+                )
+            )
+            for index in range(HISTORY_PAGE_SIZE * 2 + 20):
+                db.session.add(
+                    ResearchLog(
+                        student_id=student_id, topic=f"t{index}", query="q", report_blob=b"", created_at=same_second
+                    )
+                )
+            db.session.commit()
+            expected = db.session.execute(
+                db.select(ResearchLog.id).order_by(ResearchLog.created_at.desc(), ResearchLog.id.desc())
+            ).scalars().all()
+
+        seen, url, pages = [], f"/api/history/{student_id}", 0
+        while url:
+            data = self.client.get(url).get_json()
+            seen += [entry["research_id"] for entry in data["history"]]
+            pages += 1
+            url = data["next_before"] and (
+                f"/api/history/{student_id}?before={data['next_before']}&before_id={data['next_before_id']}"
+            )
+
+        self.assertEqual(seen, expected)
+        self.assertEqual(pages, 3)
+
+    def test_history_is_gzip_compressed(self):
+        for _ in range(5):
+            self.client.post("/api/research", json=research_payload())
+        response = self.client.get("/api/history/1", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(response.headers["Content-Encoding"], "gzip")
+        history = orjson.loads(gzip.decompress(response.data))["history"]
+        self.assertEqual(len(history), 5)
+
+    def test_history_releases_connection_before_body_is_sent(self):
+        self.client.post("/api/research", json=research_payload())
+        response = self.client.get("/api/history/1", buffered=False)
+        with self.app.app_context():
+            pool = db.engine.pool
+        body = iter(response.response)
+        next(body)
+        self.assertEqual(pool.checkedout(), 0)
+        response.close()
+
+    def test_history_rejects_invalid_cursor(self):
+        self.client.post("/api/research", json=research_payload())
+        response = self.client.get("/api/history/1?before=yesterday")
+        self.assertEqual(response.status_code, 400)
+
+
+class ZstdContextTests(unittest.TestCase):
+    def test_contexts_are_shared_by_greenlets_and_split_by_thread(self):
+        with mock.patch.dict(app_module._zstd_compressors, clear=True), mock.patch.dict(
+            app_module._zstd_decompressors, clear=True
+        ):
+            greenlets = [gevent.spawn(app_module._compress_report, orjson.dumps({"n": n})) for n in range(3)]
+            gevent.joinall(greenlets, raise_error=True)
+            self.assertEqual([app_module._decompress_report(g.value) for g in greenlets], [{"n": n} for n in range(3)])
+            self.assertEqual(len(app_module._zstd_compressors), 1)
+            self.assertEqual(len(app_module._zstd_decompressors), 1)
+
+            thread = threading.Thread(target=app_module._compress_report, args=(b"{}",))
+            thread.start()
+            thread.join()
+            self.assertEqual(len(app_module._zstd_compressors), 2)
+
+
+class EngineOptionsTests(unittest.TestCase):
+    def test_server_pool_splits_connection_budget_across_workers(self):
+        with mock.patch.dict(os.environ, {"WEB_CONCURRENCY": "17", "DB_MAX_CONNECTIONS": "80"}):
+            os.environ.pop("DB_POOL_SIZE", None)
+            options = _engine_options("postgresql://localhost/research")
+        self.assertEqual(options["pool_size"], 4)
+        self.assertEqual(options["max_overflow"], 0)
+        self.assertTrue(options["pool_pre_ping"])
+
+    def test_file_sqlite_skips_pre_ping(self):
+        with mock.patch.dict(os.environ, {"DB_POOL_SIZE": "3"}):
+            options = _engine_options("sqlite:///research_assistant.db")
+        self.assertEqual(options["pool_size"], 3)
+        self.assertNotIn("pool_pre_ping", options)
+
+
+    def test_in_memory_sqlite_urls_skip_pool_sizing(self):
+        for uri in ("sqlite://", "sqlite+pysqlite:///:memory:", "sqlite:///:memory:?cache=shared"):
+            with self.subTest(uri=uri):
+                options = _engine_options(uri)
+                self.assertNotIn("pool_size", options)
+                self.assertNotIn("max_overflow", options)
+                with mock.patch.dict(os.environ, {"DATABASE_URL": uri}):
+                    self.assertEqual(create_app().test_client().get("/api/health").status_code, 200)
+
+
+class SchemaDefaultsTests(unittest.TestCase):
+    def test_postgres_created_at_default_is_utc(self):
+        for table in (Student.__table__, ResearchLog.__table__):
+            ddl = str(CreateTable(table).compile(dialect=postgresql.dialect()))
+            self.assertIn("DEFAULT TIMEZONE('utc', CURRENT_TIMESTAMP)", ddl)
+
+
+class MigrationTests(unittest.TestCase):
+    LEGACY_SCHEMA = """
+        CREATE TABLE students (
+          id INTEGER PRIMARY KEY, name VARCHAR(120) NOT NULL, email VARCHAR(120) NOT NULL UNIQUE,
+          institution VARCHAR(200), created_at DATETIME
+        );
+        CREATE TABLE research_logs (
+          id INTEGER PRIMARY KEY, student_id INTEGER NOT NULL REFERENCES students(id), topic VARCHAR(300) NOT NULL,
+          query TEXT NOT NULL, report_json TEXT NOT NULL, created_at DATETIME
+        );
+    """
+
+    def setUp(self):
+        os.environ.pop("OPENAI_API_KEY", None)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        db_path = os.path.join(self.tmpdir.name, "legacy.db")
+        conn = sqlite3.connect(db_path)
+        conn.executescript(self.LEGACY_SCHEMA)
+        conn.execute(
+            "INSERT INTO students (name, email, created_at) "
+            "VALUES ('Ada', 'ada@example.com', '2024-05-01 10:00:00.123456')"
+        )
+        conn.execute(
+            "INSERT INTO research_logs (student_id, topic, query, report_json, created_at) "
+            "VALUES (1, 'Edge AI', 'q', '{\"abstract\": \"legacy\"}', '2024-05-01 10:00:00.123456')"
+        )
+        conn.commit()
+        conn.close()
+        self.env = mock.patch.dict(os.environ, {"DATABASE_URL": f"sqlite:///{db_path}"})
+        self.env.start()
+
+    def tearDown(self):
+        self.env.stop()
+        self.tmpdir.cleanup()
+
+    def test_migrate_converts_legacy_reports(self):
+        self.assertEqual(migrate_db.migrate(), 1)
+        self.assertEqual(migrate_db.migrate(), 0)
+
+        app = create_app()
+        client = app.test_client()
+        detail = client.get("/api/history/detail/1").get_json()
+        self.assertEqual(detail["report"], {"abstract": "legacy"})
+        self.assertEqual(detail["created_at"], "2024-05-01T10:00:00")
+
+        created = client.post("/api/research", json=research_payload(student_email="ada@example.com")).get_json()
+        self.assertEqual(created["student_id"], 1)
+        self.assertEqual(created["research_id"], 2)
+        history = client.get("/api/history/1").get_json()["history"]
+        self.assertEqual([entry["research_id"] for entry in history], [2, 1])
+        with app.app_context():
+            db.engine.dispose()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 import os
 import unittest
+from unittest import mock
 
 from research_engine import PromptEngine, ResearchService
 
@@ -14,6 +15,10 @@ class PromptEngineTests(unittest.TestCase):
         self.assertIn("abstract", prompt)
         self.assertIn("datasets_and_tools", prompt)
 
+    def test_user_prompt_keeps_topic_and_query_verbatim(self):
+        prompt = PromptEngine.build_user_prompt("Sets {A, B}", "Why {x}?")
+        self.assertTrue(prompt.startswith("Student topic: Sets {A, B}\nStudent research query: Why {x}?"))
+
 
 class ResearchServiceTests(unittest.TestCase):
     def setUp(self):
@@ -29,6 +34,38 @@ class ResearchServiceTests(unittest.TestCase):
         sources = [entry["source"] for entry in report["literature_review"]]
         self.assertEqual(sources, ["Google Scholar", "IEEE Xplore", "PubMed"])
 
+    def test_fallback_reports_are_independent_copies(self):
+        first = ResearchService.generate_report("Robotics", "Topic")
+        first["research_gaps"].append("mutated")
+        second = ResearchService.generate_report("Robotics", "Topic")
+        self.assertNotIn("mutated", second["research_gaps"])
+
+
+class ExternalReportCacheTests(unittest.TestCase):
+    def setUp(self):
+        os.environ["OPENAI_API_KEY"] = "test-key"
+        ResearchService._external_report_bytes.cache_clear()
+
+    def tearDown(self):
+        os.environ.pop("OPENAI_API_KEY", None)
+        ResearchService._external_report_bytes.cache_clear()
+
+    def test_external_report_is_fetched_once_per_prompt(self):
+        external = {key: key for key in ResearchService.REQUIRED_KEYS}
+        with mock.patch.object(ResearchService, "_try_openai_json", return_value=external) as fetch:
+            first = ResearchService.generate_report("Edge AI", "Query")
+            first["abstract"] = "mutated"
+            second = ResearchService.generate_report("Edge AI", "Query")
+        self.assertEqual(fetch.call_count, 1)
+        self.assertEqual(second["abstract"], "abstract")
+
+    def test_failed_external_call_is_not_cached(self):
+        with mock.patch.object(ResearchService, "_try_openai_json", return_value=None) as fetch:
+            report = ResearchService.generate_report("Edge AI", "Query")
+            ResearchService.generate_report("Edge AI", "Query")
+        self.assertEqual(fetch.call_count, 2)
+        self.assertEqual(report["prompt_debug"]["source"], "fallback")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -14,6 +14,18 @@ class SchemaSqlTests(unittest.TestCase):
         tables = {row[0] for row in cursor.fetchall()}
         self.assertEqual(tables, {"students", "research_logs"})
 
+    def test_history_index_is_used_for_student_lookup(self):
+        schema = Path("docs/schema.sql").read_text(encoding="utf-8")
+        conn = sqlite3.connect(":memory:")
+        conn.executescript(schema)
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM research_logs WHERE student_id = ? ORDER BY created_at DESC, id DESC",
+            (1,),
+        ).fetchall()
+        details = " ".join(row[-1] for row in plan)
+        self.assertIn("ix_research_logs_student_created", details)
+        self.assertNotIn("TEMP B-TREE", details)
+
 
 if __name__ == "__main__":
     unittest.main()